@@ -0,0 +1,86 @@
+# ----------------------------------------------------------------------------
+# Paul-modoro - A simple, cross-platform pomodoro timer
+# Copyright (c) Paul Wong 2015-17
+#
+# Focus telemetry, counting how the user interacts with the timer during each
+# task. Kept separate from paulmodoro.py so it can be imported without opening
+# a window.
+# ----------------------------------------------------------------------------
+
+# Python 2/3 compatibility via python-future package:
+#   http://python-future.org/pasteurize.html#backwards-conversion
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+from __future__ import absolute_import
+
+# Import modules
+from array import array
+
+from builtins import range
+
+
+def describe_counts(counts):
+    return ", ".join("%d %s" % (count, name) for count, name in zip(counts, FocusSampler.event_names))
+
+
+class FocusSampler(object):
+    """
+    Counts how the user interacts with the timer during each task, to give a feel for how focused
+    the time actually was. Counts live in a preallocated ring of per-task slots, so memory stays
+    fixed however long the session runs, and taking a sample just bumps a counter in place. The
+    most recent tasks can be read back with history().
+
+    @param slots  Number of tasks to remember
+    """
+
+    # Event types
+    interaction = 0     # Any key press or click on the timer window
+    cancel = 1          # Attempt to stop a running pomodoro
+    silent = 2          # Silent mode toggled
+    event_names = ("interactions", "cancel attempts", "silent toggles")
+
+    def __init__(self, slots=16):
+        self.slots = slots
+        self.width = len(FocusSampler.event_names)
+        self.counts = array("L", [0] * (slots * self.width))
+        self.names = [None] * slots     # Name of the task in each slot, or None if unused
+        self.slot = 0                   # Slot for the current task
+        self.offset = 0                 # Start of the current task's counts
+
+    def sample(self, event):
+        self.counts[self.offset + event] += 1
+
+    def summarise(self, name):
+        """
+        Print the counts for the task that just ended, then move on to the next slot (overwriting
+        the oldest task).
+
+        @param name  What to record the task as, e.g. "pomodoro" or "cancelled pomodoro"
+        """
+
+        counts = self.counts[self.offset:self.offset + self.width]
+        print("  Focus during %s: %s" % (name, describe_counts(counts)))
+        self.names[self.slot] = name
+
+        # Move on to the next slot
+        self.slot = (self.slot + 1) % self.slots
+        self.offset = self.slot * self.width
+        self.names[self.slot] = None
+        for i in range(self.offset, self.offset + self.width):
+            self.counts[i] = 0
+
+        return counts
+
+    def history(self):
+        """
+        @return (name, counts) for each remembered task, oldest first
+        """
+
+        tasks = []
+        for i in range(1, self.slots + 1):
+            slot = (self.slot + i) % self.slots
+            if self.names[slot] is not None:
+                offset = slot * self.width
+                tasks.append((self.names[slot], tuple(self.counts[offset:offset + self.width])))
+        return tasks
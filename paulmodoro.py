@@ -27,6 +27,9 @@ from builtins import range
 from future import standard_library
 standard_library.install_aliases()
 
+from focus_sampler import FocusSampler, describe_counts
+from timer_clock import TimerClock
+
 try:
     import pyglet       # For GUI
 except ImportError:     # Convenience code for auto-installing Pyglet; should change per platform
@@ -264,11 +267,14 @@ class Tracker(object):
         self.current_task = Tracker.pomodoro
         self.next_task = Tracker.short_break
         self.stop_break_attempts = 0
+        self.focus = FocusSampler()
 
     def add_pomodoro(self):
         self.pomo_count += 1
 
     def update_tasks(self):
+        self.focus.summarise(self.current_task.type)
+
         if self.current_task.type == Tracker.pomodoro.type:
             self.current_task = self.next_task
             self.next_task = Tracker.pomodoro
@@ -289,6 +295,10 @@ class Timer(object):
     player = pyglet.media.Player()
 
     def __init__(self):
+        self.clock = TimerClock(self.player, alarm, lambda: is_silent, fade_time, refresh_rate)
+        self.clock.start()
+        self.generation = 0
+
         self.start = '%s:00' % Tracker.pomodoro.length
         self.label = pyglet.text.Label(self.start, font_size=font_size_timer,
                                        x=dim_timer_x, y=dim_timer_y,
@@ -302,6 +312,10 @@ class Timer(object):
         self.length_0 = 0
         self.task_logged = False
 
+    def start_countdown(self):
+        self.running = True
+        self.generation = self.clock.start_countdown(self.length_0, self.is_pomodoro)
+
     def reset(self, task):
         if task.type == Tracker.pomodoro.type:
             self.is_pomodoro = True
@@ -309,6 +323,7 @@ class Timer(object):
             self.is_pomodoro = False
 
         self.running = False
+        self.clock.stop_countdown()
         self.time = task.length * 60 + 0.9      # Extra to avoid rounding/floor error
         self.length_0 = self.time
         self.label.text = "%02d:00" % task.length
@@ -338,7 +353,8 @@ class Timer(object):
                         looper = pyglet.media.SourceGroup(background_noise.audio_format, None)
                         looper.queue(background_noise)
                         looper.loop = True
-                        self.player.queue(looper)
+                        with self.clock.media_lock:
+                            self.player.queue(looper)
 
                     if self.tracker.pomo_count % 4 == 0:
                         self.tracker.circle_count = 0
@@ -351,36 +367,22 @@ class Timer(object):
 
                 self.task_logged = True
 
-            # Fade in background noise
-            elapsed = self.length_0 - self.time
-            if self.is_pomodoro:
-                if is_silent:
-                    self.player.volume = 0
-                else:
-                    if elapsed <= fade_time:
-                        self.player.volume = elapsed/fade_time
-                    else:
-                        self.player.volume = 1
-            # else:
-            #     self.player.volume = 0              # Mute during breaks
+            # Pick up the latest snapshot from the timing thread (fades and alarm happen there)
+            state = self.clock.state
+            if state.generation != self.generation:
+                return                              # Nothing published for this countdown yet
 
-            # Increment timer
-            self.time -= dt
+            self.time = state.time
             m, s = divmod(self.time, 60)
             self.label.text = '%02d:%02d' % (m, s)
 
-            # Fade out background noise
-            if self.is_pomodoro and self.time <= fade_time and not is_silent:
-                self.player.volume = max([self.time/fade_time, 0])
-
             # Do things when timer runs down completely
-            if self.time <= 0:
+            if state.finished:
                 self.running = False                # Stop timer running
 
-                # Sounds
-                self.player.pause()                 # Pause background noise (if playing)
-                self.player.volume = 0
-                alarm.play()                        # Play alarm sound
+                # Sounds (the alarm has already been played by the timing thread)
+                with self.clock.media_lock:
+                    self.player.pause()             # Pause background noise (if playing)
 
                 # Window
                 inst1_label.text = instruct_start
@@ -410,15 +412,29 @@ class Timer(object):
 
 
 def start_stop_timer():
+    # The timing thread may have finished the task since the last frame, e.g. if the user is
+    # responding to the alarm. Catch up first, so the press isn't taken as a cancel. A pomodoro's
+    # countdown is stopped here, so that the check and the cancel happen under one lock.
     if timer.running:
-        if timer.is_pomodoro:   # Stopping a pomodoro
+        if timer.is_pomodoro:
+            live = timer.clock.stop_countdown(timer.generation)
+        else:
+            live = timer.clock.is_live(timer.generation)
+        if not live:
+            timer.update(0)
+
+    if timer.running:
+        if timer.is_pomodoro:   # Stopping a pomodoro (only reached if it was still live, see above)
+            timer.tracker.focus.sample(FocusSampler.cancel)
             timer.reset(timer.tracker.current_task)
-            timer.player.pause()
-            timer.player.volume = 0
+            with timer.clock.media_lock:
+                timer.player.pause()
+                timer.player.volume = 0
             set_bg_color("green")
             message_label.text = message_pomodoro_reset
             inst1_label.text = instruct_start
             print("  Pomodoro cancelled")
+            timer.tracker.focus.summarise("cancelled %s" % timer.tracker.current_task.type)
         else:   # Stopping a break
             # Do nothing; remind user to stop working
             message_label.text = message_break_stop
@@ -433,14 +449,22 @@ def start_stop_timer():
 
     else:
         timer.reset(timer.tracker.current_task)
-        timer.running = True
+        timer.start_countdown()
         if timer.is_pomodoro:   # Starting a pomodoro
-            timer.player.play()
+            with timer.clock.media_lock:
+                timer.player.play()
             inst1_label.text = instruct_stop
         else:   # Starting a break
             inst1_label.text = instruct_nothing
 
 
+def sample_focus(event):
+    # Only count what happens while a task's countdown is live, not the input that starts it or
+    # a response to the alarm that the render thread hasn't caught up with yet
+    if timer.running and timer.clock.is_live(timer.generation):
+        timer.tracker.focus.sample(event)
+
+
 def set_window_floating(win):
     """
     Always on top hack, based on code from:
@@ -591,6 +615,8 @@ inst2_label = pyglet.text.Label(instruct2,
 
 @window.event
 def on_key_press(symbol, modifiers):
+    sample_focus(FocusSampler.interaction)
+
     if symbol == pyglet.window.key.SPACE:           # Start/stop timer
         start_stop_timer()
     elif symbol == pyglet.window.key.ESCAPE:        # Quit...or exit fullscreen
@@ -612,14 +638,18 @@ def on_key_press(symbol, modifiers):
             set_window_floating(window)
     elif symbol == pyglet.window.key.S:             # Silent mode (alarm still rings on finish)
         global is_silent
+        sample_focus(FocusSampler.silent)
         if is_silent:
             is_silent = False
         else:
             is_silent = True
+        timer.clock.poke()                          # Apply the new volume straight away
 
 
 @window.event
 def on_mouse_release(x, y, button, modifiers):
+    sample_focus(FocusSampler.interaction)
+
     if button == pyglet.window.mouse.RIGHT:
         start_stop_timer()
     elif button == pyglet.window.mouse.LEFT:
@@ -673,5 +703,12 @@ set_layout(window_width, window_height)
 # Run the app
 pyglet.app.run()
 
+# Sign off with how focused the session was
+focus_history = timer.tracker.focus.history()
+if focus_history:
+    print("\nFocus this session:")
+    for task_name, counts in focus_history:
+        print("  %s: %s" % (task_name, describe_counts(counts)))
+
 # Use pyinstaller to freeze to .exe
 # pyinstaller --onefile --noconsole paulmodoro.py
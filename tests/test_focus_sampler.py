@@ -0,0 +1,134 @@
+# Tests for focus telemetry; run with: python -m pytest tests
+import io
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+import unittest
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from focus_sampler import FocusSampler
+from timer_clock import TimerClock
+
+max_sample_time = 5e-6  # Per sample, in seconds; a timer tick at 10 Hz has 0.1 s to spare
+
+
+class FakeMedia(object):
+    volume = 0
+
+    def play(self):
+        pass
+
+
+def press_during_pomodoro(clock, generation, sampler):
+    """The focus side of start_stop_timer, for a press while a pomodoro is thought to be running."""
+    output = io.StringIO()
+    with redirect_stdout(output):
+        if clock.is_live(generation):
+            sampler.sample(FocusSampler.interaction)    # As sample_focus does
+        if clock.stop_countdown(generation):
+            sampler.sample(FocusSampler.cancel)
+            sampler.summarise("cancelled pomodoro")
+        else:
+            sampler.summarise("pomodoro")               # Caught up via Timer.update and update_tasks
+
+
+def summarise_quietly(sampler, name):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        counts = sampler.summarise(name)
+    return counts, output.getvalue()
+
+
+class FocusSamplerTest(unittest.TestCase):
+    def test_summarise_prints_rotates_and_zeroes_next_slot(self):
+        sampler = FocusSampler(slots=2)
+        sampler.sample(FocusSampler.interaction)
+        sampler.sample(FocusSampler.interaction)
+        sampler.sample(FocusSampler.cancel)
+
+        counts, output = summarise_quietly(sampler, "pomodoro")
+        self.assertEqual(list(counts), [2, 1, 0])
+        self.assertEqual(output, "  Focus during pomodoro: 2 interactions, 1 cancel attempts, 0 silent toggles\n")
+        self.assertEqual(sampler.slot, 1)
+
+        sampler.sample(FocusSampler.silent)
+        summarise_quietly(sampler, "short break")
+
+        # Wrapped around to the first slot, which must start from zero again
+        self.assertEqual(sampler.slot, 0)
+        self.assertEqual(list(sampler.counts[0:3]), [0, 0, 0])
+        sampler.sample(FocusSampler.interaction)
+        counts, _ = summarise_quietly(sampler, "pomodoro")
+        self.assertEqual(list(counts), [1, 0, 0])
+
+    def test_history_keeps_most_recent_tasks_oldest_first(self):
+        sampler = FocusSampler(slots=3)
+        self.assertEqual(sampler.history(), [])
+
+        for name in ("pomodoro", "cancelled pomodoro", "pomodoro", "short break"):
+            sampler.sample(FocusSampler.interaction)
+            summarise_quietly(sampler, name)
+
+        # Only slots - 1 finished tasks fit, since the current task holds a slot too
+        self.assertEqual(sampler.history(), [("pomodoro", (1, 0, 0)), ("short break", (1, 0, 0))])
+
+    def test_press_during_live_pomodoro_is_a_cancel(self):
+        clock = TimerClock(FakeMedia(), FakeMedia(), lambda: False)
+        clock.start()
+        sampler = FocusSampler()
+        generation = clock.start_countdown(1, True)
+
+        press_during_pomodoro(clock, generation, sampler)
+        self.assertEqual(sampler.history(), [("cancelled pomodoro", (1, 1, 0))])
+
+    def test_press_after_unnoticed_finish_is_not_a_cancel(self):
+        clock = TimerClock(FakeMedia(), FakeMedia(), lambda: False)
+        clock.start()
+        sampler = FocusSampler()
+        generation = clock.start_countdown(0.1, True)
+        time.sleep(0.25)                                # Alarm rings, render thread yet to notice
+
+        press_during_pomodoro(clock, generation, sampler)
+        self.assertEqual(sampler.history(), [("pomodoro", (0, 0, 0))])
+
+    def test_memory_is_fixed(self):
+        sampler = FocusSampler()
+        size = len(sampler.counts)
+        for _ in range(100):
+            sampler.sample(FocusSampler.interaction)
+            summarise_quietly(sampler, "pomodoro")
+        self.assertEqual(len(sampler.counts), size)
+        self.assertEqual(len(sampler.names), sampler.slots)
+
+    def test_sample_does_not_allocate(self):
+        sampler = FocusSampler()
+        sampler.sample(FocusSampler.interaction)
+
+        def traced_growth(action):
+            tracemalloc.start()
+            try:
+                before = tracemalloc.get_traced_memory()[0]
+                for _ in range(10000):
+                    action(FocusSampler.interaction)
+                return tracemalloc.get_traced_memory()[0] - before
+            finally:
+                tracemalloc.stop()
+
+        # Compare with a loop doing nothing, which keeps its last loop counter alive
+        self.assertEqual(traced_growth(sampler.sample), traced_growth(lambda event: None))
+        self.assertEqual(sampler.counts[FocusSampler.interaction], 10001)
+
+    def test_sample_is_cheap(self):
+        sampler = FocusSampler()
+        runs = 100000
+        per_sample = min(timeit.repeat(lambda: sampler.sample(FocusSampler.interaction),
+                                        number=runs, repeat=3)) / runs
+        self.assertLess(per_sample, max_sample_time)
+
+
+if __name__ == "__main__":
+    unittest.main()
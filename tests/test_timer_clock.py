@@ -0,0 +1,148 @@
+# Tests for the timing thread; run with: python -m pytest tests
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timer_clock import TimerClock, monotonic
+
+tolerance = 0.05        # How late the alarm may ring, in seconds
+
+
+class FakePlayer(object):
+    def __init__(self, fail_count=0, fail_from=None):
+        self.volume = 0
+        self.fail_count = fail_count    # Number of volume changes to fail, like a player mid-teardown
+        self.fail_from = fail_from      # Fail every volume change from this time on
+
+    def __setattr__(self, name, value):
+        if name == "volume":
+            fail_from = getattr(self, "fail_from", None)
+            if fail_from is not None and monotonic() >= fail_from:
+                raise AttributeError("'NoneType' object has no attribute 'set_volume'")
+            if getattr(self, "fail_count", 0) > 0:
+                self.fail_count -= 1
+                raise AttributeError("'NoneType' object has no attribute 'set_volume'")
+        object.__setattr__(self, name, value)
+
+
+class FakeAlarm(object):
+    def __init__(self):
+        self.rung = []
+
+    def play(self):
+        self.rung.append(monotonic())
+
+
+def busy_wait(seconds):
+    # Unlike time.sleep, this keeps hold of the interpreter lock, as a slow frame would
+    end = monotonic() + seconds
+    while monotonic() < end:
+        pass
+
+
+def render_loop(clock, generation, duration, stall, media_time):
+    """
+    Stand-in for the render thread. Each frame makes a media call under media_lock, as
+    Timer.update and start_stop_timer do, polls the published state, then stalls.
+    """
+
+    finished_at = None
+    end = monotonic() + duration
+    while monotonic() < end:
+        with clock.media_lock:
+            busy_wait(media_time)
+        state = clock.state
+        if state.generation == generation and state.finished and finished_at is None:
+            finished_at = monotonic()
+        busy_wait(stall)
+    return finished_at
+
+
+class TimerClockTest(unittest.TestCase):
+    def make_clock(self, player=None):
+        self.alarm = FakeAlarm()
+        self.player = player or FakePlayer()
+        clock = TimerClock(self.player, self.alarm, lambda: False, fade_time=0.5)
+        clock.start()
+        return clock
+
+    def test_alarm_on_time_despite_render_stalls(self):
+        clock = self.make_clock()
+        stall, media_time = 0.5, 0.01
+
+        # Finish in the middle of the third frame's media call, so the clock has to wait for it
+        length = 2 * (stall + media_time) + media_time/2
+        generation = clock.start_countdown(length, True)
+        deadline = clock.countdown[1]
+
+        finished_at = render_loop(clock, generation, length + 1.2, stall, media_time)
+
+        self.assertEqual(len(self.alarm.rung), 1)
+        self.assertGreaterEqual(self.alarm.rung[0], deadline)
+        self.assertLess(self.alarm.rung[0] - deadline, tolerance)
+
+        # The render thread only notices at its next frame, but still sees the finished state
+        self.assertIsNotNone(finished_at)
+        self.assertEqual(self.player.volume, 0)
+
+    def test_stopped_countdown_never_rings(self):
+        clock = self.make_clock()
+        generation = clock.start_countdown(0.3, True)
+        time.sleep(0.1)
+        self.assertTrue(clock.is_live(generation))
+        self.assertTrue(clock.stop_countdown(generation))
+        time.sleep(0.4)
+
+        self.assertEqual(self.alarm.rung, [])
+        self.assertFalse(clock.is_live(generation))
+
+    def test_stop_after_alarm_reports_finished(self):
+        # A press in response to the alarm, before the render thread has seen the finished state
+        clock = self.make_clock()
+        generation = clock.start_countdown(0.2, True)
+        time.sleep(0.35)
+
+        self.assertFalse(clock.is_live(generation))
+        self.assertFalse(clock.stop_countdown(generation))
+        self.assertEqual(len(self.alarm.rung), 1)
+        self.assertEqual(clock.state.generation, generation)
+        self.assertTrue(clock.state.finished)
+
+    def test_restarted_countdown_rings_once(self):
+        clock = self.make_clock()
+        clock.start_countdown(0.2, False)
+        time.sleep(0.1)
+        generation = clock.start_countdown(0.2, False)
+        time.sleep(0.4)
+
+        self.assertEqual(len(self.alarm.rung), 1)
+        self.assertEqual(clock.state.generation, generation)
+        self.assertTrue(clock.state.finished)
+
+    def test_keeps_time_when_player_fails(self):
+        clock = self.make_clock(FakePlayer(fail_count=3))
+        clock.start_countdown(0.5, True)
+        deadline = clock.countdown[1]
+        time.sleep(0.8)
+
+        self.assertEqual(len(self.alarm.rung), 1)
+        self.assertLess(self.alarm.rung[0] - deadline, tolerance)
+
+    def test_rings_when_final_volume_change_fails(self):
+        player = FakePlayer()
+        clock = self.make_clock(player)
+        clock.start_countdown(0.5, True)
+        deadline = clock.countdown[1]
+        player.fail_from = deadline
+        time.sleep(0.8)
+
+        self.assertTrue(clock.state.finished)
+        self.assertEqual(len(self.alarm.rung), 1)
+        self.assertLess(self.alarm.rung[0] - deadline, tolerance)
+
+
+if __name__ == "__main__":
+    unittest.main()
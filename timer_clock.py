@@ -0,0 +1,148 @@
+# ----------------------------------------------------------------------------
+# Paul-modoro - A simple, cross-platform pomodoro timer
+# Copyright (c) Paul Wong 2015-17
+#
+# Timing thread for the countdown, alarm and background noise fades. Kept
+# separate from paulmodoro.py so it can be imported without opening a window.
+# ----------------------------------------------------------------------------
+
+# Python 2/3 compatibility via python-future package:
+#   http://python-future.org/pasteurize.html#backwards-conversion
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+from __future__ import absolute_import
+
+# Import modules
+import time
+import threading
+import traceback
+
+from collections import namedtuple
+
+monotonic = getattr(time, "monotonic", time.time)   # Python 2 has no monotonic clock
+
+# Snapshot of the countdown, as published by the timing thread
+ClockState = namedtuple("ClockState", ["generation", "time", "finished"])
+
+
+class TimerClock(threading.Thread):
+    """
+    Runs the countdown, alarm and background noise fades on a thread of its own, so that slow
+    frames (e.g. toggling full screen) can't hold up the alarm. The thread sleeps until its next
+    deadline, then publishes an immutable ClockState for the render thread to pick up.
+
+    The state is swapped in with a single assignment, so the render thread reads it without a
+    lock. Media calls from this thread and the render thread should hold media_lock, so the two
+    don't interleave calls on the same player. pyglet's own event loop and audio worker still
+    touch the players without it, so run() logs any error that slips through and keeps time.
+
+    Python can't raise a thread's priority, so this is an ordinary daemon thread. That is enough,
+    since it never waits on rendering: a busy render thread has to give up the interpreter lock
+    every few milliseconds (see sys.getswitchinterval), so the alarm is only late by that much.
+
+    @param player     The player for background noise, faded in and out during pomodoros
+    @param alarm      The source to play when a countdown finishes
+    @param is_silent  Function returning True while silent mode is on
+    """
+
+    def __init__(self, player, alarm, is_silent, fade_time=3, refresh_rate=10):
+        threading.Thread.__init__(self, name="TimerClock")
+        self.daemon = True      # Don't keep the app alive once the window closes
+
+        self.player = player
+        self.alarm = alarm
+        self.is_silent = is_silent
+        self.fade_time = fade_time          # In seconds
+        self.step = 1/refresh_rate          # Time between fade steps
+
+        self.media_lock = threading.RLock()
+        self.countdown = None   # (generation, deadline, length, is_pomodoro)
+        self.generation = 0
+        self.fired = 0          # Generation of the last countdown to ring the alarm
+        self.state = ClockState(0, 0, False)
+        self.wake = threading.Event()
+
+    def start_countdown(self, length, is_pomodoro):
+        with self.media_lock:
+            self.generation += 1
+            self.countdown = (self.generation, monotonic() + length, length, is_pomodoro)
+        self.wake.set()
+        return self.generation
+
+    def is_live(self, generation):
+        """
+        @return True if the countdown is still running, i.e. hasn't been stopped or finished
+        """
+
+        countdown = self.countdown
+        return countdown is not None and countdown[0] == generation and generation != self.fired
+
+    def stop_countdown(self, generation=None):
+        """
+        @param generation  The countdown the caller thinks is running, if any
+        @return True if that countdown was stopped while still live, False if it had already finished
+        """
+
+        # Taking the lock means a tick already in progress can't ring or fade after this returns
+        with self.media_lock:
+            live = self.is_live(generation)
+            self.countdown = None
+        self.wake.set()
+        return live
+
+    def poke(self):
+        self.wake.set()         # Re-run the current tick now, e.g. to apply silent mode
+
+    def run(self):
+        while True:
+            self.wake.clear()
+            countdown = self.countdown
+            if countdown is None or countdown[0] == self.fired:
+                self.wake.wait()                # Idle until a countdown is started
+                continue
+
+            try:
+                self.tick(countdown)
+            except Exception:
+                # Keep time even if a media call fails, otherwise the alarm would never ring
+                traceback.print_exc()
+                self.wake.wait(self.step)
+
+    def tick(self, countdown):
+        generation, deadline, length, is_pomodoro = countdown
+        fade_time = self.fade_time
+
+        with self.media_lock:
+            if self.countdown is not countdown:
+                return                          # Stopped or restarted since we last looked
+
+            remaining = deadline - monotonic()
+            elapsed = length - remaining
+
+            # Do things when timer runs down completely
+            if remaining <= 0:
+                self.state = ClockState(generation, 0, True)
+                self.fired = generation         # Only ring once, even if the calls below fail
+                try:
+                    self.alarm.play()           # Play alarm sound
+                finally:
+                    if is_pomodoro:             # Silence background noise, even if the alarm failed
+                        self.player.volume = 0
+                return
+
+            self.state = ClockState(generation, remaining, False)
+
+            # Fade background noise in and out
+            if is_pomodoro:
+                if self.is_silent():
+                    self.player.volume = 0
+                else:
+                    self.player.volume = max(min(elapsed/fade_time, remaining/fade_time, 1), 0)
+
+        # Sleep until the displayed second changes, or the next fade step
+        if is_pomodoro and (elapsed < fade_time or remaining <= fade_time):
+            timeout = self.step
+        else:
+            timeout = remaining % 1 or 1
+        self.wake.wait(min(timeout, remaining))